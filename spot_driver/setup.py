@@ -7,6 +7,7 @@ d = generate_distutils_setup(
         "scripts/spot_ros",
         "test/ros_helpers_test.py",
         "test/spot_ros_test.py",
+        "test/teleop_funcs_test.py",
     ],
     package_dir={"": "src"},
 )
@@ -18,7 +18,6 @@ from bosdyn.api.geometry_pb2 import Quaternion, SE2VelocityLimit
 from bosdyn.api.spot import robot_command_pb2 as spot_command_pb2
 from bosdyn.client import math_helpers
 from geometry_msgs.msg import Twist, PoseStamped
-from sensor_msgs.msg import Joy
 from google.protobuf.wrappers_pb2 import DoubleValue
 from spot_msgs.msg import BatteryState, BatteryStateArray
 from spot_msgs.msg import BehaviorFaultState
@@ -1564,6 +1563,7 @@ class SpotROS:
 
     def shutdown(self):
         rospy.loginfo("Shutting down ROS driver for Spot")
+        self.teleop_funcs.shutdown()
         self.spot_wrapper.sit()
         rospy.Rate(0.25).sleep()
         self.spot_wrapper.disconnect()
@@ -1881,12 +1881,7 @@ class SpotROS:
             self.in_motion_or_idle_pose_cb,
             queue_size=1,
         )
-        rospy.Subscriber(
-            "/bluetooth_teleop/joy",
-            Joy,
-            self.teleop_funcs.handle_joy,
-            queue_size=1,
-        )
+        self.teleop_funcs.make_subscriber("/bluetooth_teleop/joy")
 
     def initialize_services(self):
         rospy.Service("claim", Trigger, self.handle_claim)
@@ -1,30 +1,89 @@
+"""
+Joystick teleop for discrete Spot actions (power, sit/stand, locomotion and
+stairs modes).
+
+Subscribe TeleopFuncs.handle_joy through TeleopFuncs.make_subscriber. It uses
+queue_size=1 so that a Joy message arriving while the callback is busy replaces
+the one waiting, rather than queueing behind it, and tcp_nodelay so small Joy
+messages are not held back by Nagle's algorithm.
+
+handle_joy only records the latest message. A rospy.Timer samples it at a
+fixed rate, so bursts of Joy messages collapse to the most recent one.
+"""
+
+import rospy
 from sensor_msgs.msg import Joy
 from bosdyn.api.spot import robot_command_pb2 as spot_command_pb2
-from enum import IntEnum
-from threading import Lock
+from bosdyn.client import RpcError
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import time
 
-class LocomotionHint(IntEnum):
-    HINT_AUTO = 1
-    HINT_TROT = 2
-    HINT_SPEED_SELECT_TROT = 3
-    HINT_CRAWL = 4
-    HINT_SPEED_SELECT_CRAWL = 10
-    HINT_AMBLE = 5
-    HINT_SPEED_SELECT_AMBLE = 6
+# Locomotion hints and stairs modes, resolved from the proto once at import.
+_LH = spot_command_pb2.LocomotionHint
+HINT_AUTO = _LH.HINT_AUTO
+HINT_TROT = _LH.HINT_TROT
+HINT_SPEED_SELECT_TROT = _LH.HINT_SPEED_SELECT_TROT
+HINT_CRAWL = _LH.HINT_CRAWL
+HINT_SPEED_SELECT_CRAWL = _LH.HINT_SPEED_SELECT_CRAWL
+HINT_AMBLE = _LH.HINT_AMBLE
+HINT_SPEED_SELECT_AMBLE = _LH.HINT_SPEED_SELECT_AMBLE
+
+_SM = spot_command_pb2.MobilityParams.StairsMode
+STAIRS_MODE_OFF = _SM.STAIRS_MODE_OFF
+STAIRS_MODE_ON = _SM.STAIRS_MODE_ON
+STAIRS_MODE_AUTO = _SM.STAIRS_MODE_AUTO
 
-    @classmethod
-    def _missing_(cls, value):
-        return cls.HINT_AUTO
+# Joystick axes used to request robot actions.
+ENABLE_AXIS = 2  # L2, deadman for all requests below
+POWER_AXIS = 5  # R2, power on/off
+SIT_STAND_AXIS = 7  # D-pad vertical, sit/stand
+MODE_AXIS = 6  # D-pad horizontal, locomotion mode (+) and stairs mode (-)
 
-class StairsMode(IntEnum):
-    STAIRS_MODE_OFF = 1
-    STAIRS_MODE_ON = 2
-    STAIRS_MODE_AUTO = 3
+ENABLE_THRESHOLD = 0.99
+TOGGLE_THRESHOLD = 0.9
 
-    @classmethod
-    def _missing_(cls, value):
-        return cls.STAIRS_MODE_AUTO
+# A two-state robot action. When check() is true the robot is switched with
+# if_true, otherwise with if_false; labels holds the (true, false) log messages.
+_ToggleAction = namedtuple(
+    "_ToggleAction",
+    ["name", "check", "if_true", "if_false", "labels", "pause_ns", "needs_motion"],
+)
+
+# A mode cycled with the D-pad: the MobilityParams field it sets, and the hint
+# values with their display names in parallel tuples.
+_ModeCycle = namedtuple("_ModeCycle", ["name", "field", "hints", "names"])
+
+_MODES = {
+    "locomotion": _ModeCycle(
+        name="locomotion",
+        field="locomotion_hint",
+        hints=(
+            HINT_AUTO,
+            HINT_TROT,
+            HINT_SPEED_SELECT_TROT,
+            HINT_CRAWL,
+            HINT_SPEED_SELECT_CRAWL,
+            HINT_AMBLE,
+            HINT_SPEED_SELECT_AMBLE,
+        ),
+        names=(
+            "AUTO",
+            "TROT",
+            "TROT WITH STOP",
+            "CRAWL",
+            "CRAWL WITH STOP",
+            "AMBLE",
+            "AMBLE WITH STOP",
+        ),
+    ),
+    "stairs": _ModeCycle(
+        name="stair",
+        field="stairs_mode",
+        hints=(STAIRS_MODE_OFF, STAIRS_MODE_ON, STAIRS_MODE_AUTO),
+        names=("OFF", "ON", "AUTOSELECT"),
+    ),
+}
 
 class TeleopFuncs:
     """
@@ -33,146 +92,207 @@ class TeleopFuncs:
     handles control (velocity) commands.
     """
 
+    __slots__ = (
+        "spot_wrapper",
+        "movement_query_fn",
+        "max_joy_age_secs",
+        "_pause_until_ns",
+        "_executor",
+        "_inflight",
+        "_last_requests",
+        "_actions",
+        "_mode_idx",
+        "_latest_joy",
+        "_processed_joy",
+        "_timer",
+    )
+
     def __init__(
         self, 
         spot_wrapper, 
         movement_query_fn,
         power_on_pause_secs=3,
         sit_stand_pause_secs=5,
-        toggle_pause_secs=0.5,
+        max_joy_age_secs=0.1,
+        joy_process_period_secs=0.02,
     ) -> None:
         self.spot_wrapper = spot_wrapper
         self.movement_query_fn = movement_query_fn
-        self.power_on_pause_secs = power_on_pause_secs
-        self.sit_stand_pause_secs = sit_stand_pause_secs
-        self.toggle_pause_secs = toggle_pause_secs
-        self.pause = False
-        self.lock = Lock()
-
-        self.valid_locomotion_hints = [
-            (LocomotionHint.HINT_AUTO, "AUTO"),
-            (LocomotionHint.HINT_TROT, "TROT"),
-            (LocomotionHint.HINT_SPEED_SELECT_TROT, "TROT WITH STOP"),
-            (LocomotionHint.HINT_CRAWL, "CRAWL"),
-            (LocomotionHint.HINT_SPEED_SELECT_CRAWL, "CRAWL WITH STOP"),
-            (LocomotionHint.HINT_AMBLE, "AMBLE"),
-            (LocomotionHint.HINT_SPEED_SELECT_AMBLE, "AMBLE WITH STOP"),
-        ]
-        self.locomotion_mode_idx = 0
-
-        self.valid_stair_hints = [
-            (StairsMode.STAIRS_MODE_OFF, "OFF"),
-            (StairsMode.STAIRS_MODE_ON,  "ON"),
-            (StairsMode.STAIRS_MODE_AUTO, "AUTOSELECT"),
-        ]
-        self.stair_mode_idx = 0
+        self.max_joy_age_secs = max_joy_age_secs
+        # Refractory period after a robot action, as a time.monotonic_ns() deadline.
+        # Only the worker writes it and a single int store needs no lock.
+        self._pause_until_ns = 0
+        # Spot API calls block, so they run on a worker thread instead of the Joy callback.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._inflight = None
+        # Previous (power, sit/stand, locomotion, stairs) request states, so
+        # requests trigger on the press edge only.
+        self._last_requests = (False, False, False, False)
+
+        # For sit/stand we check if it is sitting first. There can be occasions
+        # where it is registered as both in sitting and standing states by the
+        # wrapper. In these ambiguous situations, it is safer to try and stand
+        # (from a known sitting position, or a standing position) than to try
+        # and sit into a position of unknown stability.
+        sw = spot_wrapper
+        self._actions = {
+            "power": _ToggleAction(
+                name="power on/off",
+                check=sw.check_is_powered_on,
+                if_true=sw.safe_power_off,
+                if_false=sw.power_on,
+                labels=("ON --> OFF", "OFF --> ON"),
+                pause_ns=int(power_on_pause_secs * 1e9),
+                needs_motion=False,
+            ),
+            "sit_stand": _ToggleAction(
+                name="sit/stand",
+                check=lambda: sw.is_sitting,  # Property, not a method
+                if_true=sw.stand,
+                if_false=sw.sit,
+                labels=("SIT --> STAND", "STAND --> SIT"),
+                pause_ns=int(sit_stand_pause_secs * 1e9),
+                needs_motion=True,
+            ),
+        }
+        self._mode_idx = {"locomotion": 0, "stairs": 0}
+
+        # Written by the subscriber, read by the timer. The timer never writes it
+        # back, so a message arriving mid-sample is not lost.
+        self._latest_joy = None
+        self._processed_joy = None
+        self._timer = rospy.Timer(
+            rospy.Duration(joy_process_period_secs), self._process_latest
+        )
 
     def handle_joy(self, joy_msg):
-        enable = joy_msg.axes[2] < -0.99
-        if enable:
-            with self.lock:
-                print("Enabled:", self.pause)
-            trigger_check = False
-            toggle_check = False
-
-            toggle_power = False
-            toggle_sit_stand = False
-            toggle_locomotion_mode = False
-            toggle_stairs_mode = False
-
-            with self.lock:
-                # Check requests that will trigger robot actions with refractory period.
-                if not self.pause:
-                    toggle_power = joy_msg.axes[5] < -0.9 # Power on/off request
-                    toggle_sit_stand = joy_msg.axes[7] > 0.9 # Sit/stand request
-                    toggle_locomotion_mode = joy_msg.axes[6] > 0.9 # Locomotion mode change request
-                    toggle_stairs_mode = joy_msg.axes[6] < -0.9 # Stairs mode change request
-                self.pause = (
-                    toggle_power 
-                    or toggle_sit_stand 
-                    or toggle_locomotion_mode 
-                    or toggle_stairs_mode
+        self._latest_joy = joy_msg
+
+    def _process_latest(self, event):
+        joy_msg = self._latest_joy
+        if joy_msg is None or joy_msg is self._processed_joy:
+            return
+        self._processed_joy = joy_msg
+
+        # Drop stale messages, e.g. the last one sent before the joystick went quiet.
+        # This runs before the edge state is recorded, so a press in a dropped
+        # message still fires on the next fresh one. Unstamped messages cannot be
+        # aged, so they are always handled.
+        stamp = joy_msg.header.stamp
+        if not stamp.is_zero():
+            age = (rospy.Time.now() - stamp).to_sec()
+            if age > self.max_joy_age_secs:
+                rospy.logwarn_throttle(
+                    5.0,
+                    "Dropping Joy message {:.3f}s old (max {}s), check the "
+                    "publisher's clock and use_sim_time".format(
+                        age, self.max_joy_age_secs
+                    ),
                 )
+                return
 
-            # Handle mode change requests (only highest priority request)
-            if toggle_power:
-                self._handle_toggle_power()
-            elif toggle_sit_stand:
-                self._handle_toggle_sit_stand()
-            elif toggle_locomotion_mode:
-                self._handle_toggle_locomotion_mode()
-            elif toggle_stairs_mode:
-                self._handle_toggle_stairs_mode()
-
-    def _handle_toggle_power(self):
-        print("Received power on/off command")
-        if self.spot_wrapper.check_is_powered_on():
-            resp = self.spot_wrapper.safe_power_off()
-            print("ON --> OFF", resp[0], resp[1])
-        else:
-            resp = self.spot_wrapper.power_on()
-            print("OFF --> ON", resp[0], resp[1])
-
-        # BD API is non-blocking, so we add a little wait afterward
-        time.sleep(self.power_on_pause_secs)
-
-        with self.lock:
-            self.pause = False
-
-    def _handle_toggle_sit_stand(self):
-        print("Received sit/stand command")
-        if not self.movement_query_fn(autonomous_command=False):
-            return "Not changing sit/stand. Robot motion not allowed!"
-        
-        # We check if it is sitting first. There can be occasions
-        # where it is registered as both in sitting and standing
-        # states by the wrapper. In these ambiguous situations, it
-        # is safer to try and stand (from a known sitting position,
-        # or a standing position) than to try and sit into a position
-        # of unknown stability.
-        if self.spot_wrapper.is_sitting:
-            resp = self.spot_wrapper.stand()
-            print("SIT --> STAND:", resp[0], resp[1])
-        else:
-            resp = self.spot_wrapper.sit()
-            print("STAND --> SIT", resp[0], resp[1])
+        axes = joy_msg.axes
+        # A request fires when it becomes active, i.e. its axis is past the
+        # threshold while the deadman is held, so holding the buttons triggers it
+        # once rather than on every message. The state is tracked on every fresh
+        # message, including ones ignored below, so it is never out of date.
+        enabled = axes[ENABLE_AXIS] < -ENABLE_THRESHOLD
+        requests = (
+            enabled and axes[POWER_AXIS] < -TOGGLE_THRESHOLD,
+            enabled and axes[SIT_STAND_AXIS] > TOGGLE_THRESHOLD,
+            enabled and axes[MODE_AXIS] > TOGGLE_THRESHOLD,
+            enabled and axes[MODE_AXIS] < -TOGGLE_THRESHOLD,
+        )
+        last = self._last_requests
+        self._last_requests = requests
+        # Nothing to do unless the deadman is held, which is most messages.
+        if not enabled:
+            return
+        toggle_power, toggle_sit_stand, toggle_locomotion_mode, toggle_stairs_mode = (
+            now and not before for now, before in zip(requests, last)
+        )
 
-        # BD API is non-blocking, so we add a little wait afterward
-        time.sleep(self.sit_stand_pause_secs)
+        paused = (
+            self._inflight is not None and not self._inflight.done()
+        ) or time.monotonic_ns() < self._pause_until_ns
+        rospy.logdebug_throttle(1.0, "Teleop enabled, paused: {}".format(paused))
+        # Ignore requests that would trigger robot actions while one is still
+        # running or during the refractory period after power/sit/stand.
+        if paused:
+            return
 
-        with self.lock:
-            self.pause = False
+        # Handle mode change requests (only highest priority request)
+        if toggle_power:
+            self._submit(self._dispatch, "power")
+        elif toggle_sit_stand:
+            self._submit(self._dispatch, "sit_stand")
+        elif toggle_locomotion_mode:
+            self._submit(self._cycle_mode, "locomotion")
+        elif toggle_stairs_mode:
+            self._submit(self._cycle_mode, "stairs")
 
-    def _handle_toggle_locomotion_mode(self):
-        self.locomotion_mode_idx = (self.locomotion_mode_idx + 1) % len(self.valid_locomotion_hints)
-        locomotion_hint, msg = self.valid_locomotion_hints[self.locomotion_mode_idx]
-        try:
-            mobility_params = self.spot_wrapper.get_mobility_params()
-            mobility_params.locomotion_hint = locomotion_hint
-            self.spot_wrapper.set_mobility_params(mobility_params)
-            print("Set locomotion mode to: ", msg)
-        except Exception as e:
-            print("Error setting locomotion mode:{}".format(e))
-        
-        # BD API is non-blocking, so we add a little wait afterward
-        time.sleep(self.toggle_pause_secs)
-
-        with self.lock:
-            self.pause = False
-
-    def _handle_toggle_stairs_mode(self):
-        self.stair_mode_idx = (self.stair_mode_idx + 1) % len(self.valid_stair_hints)
-        stair_hint, msg = self.valid_stair_hints[self.stair_mode_idx]
+    def make_subscriber(self, topic):
+        return rospy.Subscriber(
+            topic,
+            Joy,
+            self.handle_joy,
+            queue_size=1,
+            tcp_nodelay=True,
+            buff_size=65536,
+        )
+
+    def shutdown(self):
+        self._timer.shutdown()
+        # Let a running request finish before the driver sits the robot, so a
+        # late stand()/power_on() cannot land after the shutdown sit. The guard
+        # in _process_latest means at most one request is ever queued, so
+        # cancelling it matches shutdown(cancel_futures=True), which needs
+        # Python 3.9 (Noetic ships 3.8).
+        if self._inflight is not None:
+            self._inflight.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, fn, key):
+        self._inflight = self._executor.submit(fn, key)
+        self._inflight.add_done_callback(self._log_failure)
+
+    def _log_failure(self, future):
+        # Exceptions raised on the worker are stored on the future, so log them
+        # here or they are never seen.
+        if future.cancelled():
+            return
+        e = future.exception()
+        if e is not None:
+            rospy.logerr("Teleop request failed: {!r}".format(e))
+
+    def _dispatch(self, key):
+        action = self._actions[key]
+        rospy.loginfo("Received {} command".format(action.name))
+        if action.needs_motion and not self.movement_query_fn(autonomous_command=False):
+            rospy.logwarn(
+                "Not changing {}. Robot motion not allowed!".format(action.name)
+            )
+            return
+
+        if action.check():
+            resp = action.if_true()
+            label = action.labels[0]
+        else:
+            resp = action.if_false()
+            label = action.labels[1]
+        rospy.loginfo("{}: {} {}".format(label, resp[0], resp[1]))
+
+        # BD API is non-blocking, so we hold off further requests for a little while
+        self._pause_until_ns = time.monotonic_ns() + action.pause_ns
+
+    def _cycle_mode(self, key):
+        mode = _MODES[key]
+        idx = (self._mode_idx[key] + 1) % len(mode.hints)
+        self._mode_idx[key] = idx
         try:
             mobility_params = self.spot_wrapper.get_mobility_params()
-            mobility_params.stair_hint = stair_hint
+            setattr(mobility_params, mode.field, mode.hints[idx])
             self.spot_wrapper.set_mobility_params(mobility_params)
-            print("Set stair mode to: ", msg)
-        except Exception as e:
-            print("Error setting stair mode:{}".format(e))
-
-        # BD API is non-blocking, so we add a little wait afterward
-        time.sleep(self.toggle_pause_secs)
-
-        with self.lock:
-            self.pause = False
+            rospy.loginfo("Set {} mode to: {}".format(mode.name, mode.names[idx]))
+        except RpcError as e:
+            rospy.logerr_throttle(1.0, "Error setting {} mode:{}".format(mode.name, e))
@@ -4,6 +4,7 @@ import rosunit
 
 test_cases: typing.List[typing.Tuple[str, str, str]] = [
     ("ros_helpers", "ros_helpers_test", "ros_helpers_test.TestSuiteROSHelpers"),
+    ("teleop_funcs", "teleop_funcs_test", "teleop_funcs_test.TestSuiteTeleopFuncs"),
 ]
 
 for test_case in test_cases:
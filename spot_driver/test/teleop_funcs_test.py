@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+PKG = "teleop_funcs"
+NAME = "teleop_funcs_test"
+SUITE = "teleop_funcs_test.TestSuiteTeleopFuncs"
+
+import time
+import unittest
+from concurrent import futures
+from unittest import mock
+
+import rospy
+from sensor_msgs.msg import Joy
+
+from bosdyn.api.spot import robot_command_pb2 as spot_command_pb2
+from bosdyn.client import RpcError
+
+import spot_driver.teleop_funcs as teleop_funcs
+
+RELEASED = 1.0  # Resting value of the L2/R2 trigger axes
+
+
+class StubSpotWrapper:
+    """Records the calls TeleopFuncs makes instead of talking to a robot."""
+
+    def __init__(self):
+        self.calls = []
+        self.powered_on = False
+        self.sitting = True
+        self.mobility_params = spot_command_pb2.MobilityParams()
+
+    @property
+    def is_sitting(self):
+        return self.sitting
+
+    def check_is_powered_on(self):
+        return self.powered_on
+
+    def power_on(self):
+        self.calls.append("power_on")
+        self.powered_on = True
+        return True, "Success"
+
+    def safe_power_off(self):
+        self.calls.append("safe_power_off")
+        self.powered_on = False
+        return True, "Success"
+
+    def stand(self):
+        self.calls.append("stand")
+        self.sitting = False
+        return True, "Success"
+
+    def sit(self):
+        self.calls.append("sit")
+        self.sitting = True
+        return True, "Success"
+
+    def get_mobility_params(self):
+        return self.mobility_params
+
+    def set_mobility_params(self, mobility_params):
+        self.calls.append("set_mobility_params")
+        self.mobility_params = mobility_params
+
+
+class TeleopFuncsTestCase(unittest.TestCase):
+    def setUp(self):
+        # Tests drive _process_latest directly instead of through the timer.
+        rospy.rostime.set_rostime_initialized(True)
+        patcher = mock.patch.object(teleop_funcs.rospy, "Timer")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.spot_wrapper = StubSpotWrapper()
+        self.motion_allowed = True
+        self.teleop = self.make_teleop(power_on_pause_secs=0, sit_stand_pause_secs=0)
+
+    def make_teleop(self, **kwargs):
+        teleop = teleop_funcs.TeleopFuncs(
+            spot_wrapper=self.spot_wrapper,
+            movement_query_fn=lambda autonomous_command: self.motion_allowed,
+            **kwargs
+        )
+        self.addCleanup(teleop.shutdown)
+        return teleop
+
+    def send(self, enable=True, power=False, sit_stand=False, mode=0.0, age=0.0):
+        axes = [0.0] * 8
+        axes[teleop_funcs.ENABLE_AXIS] = -1.0 if enable else RELEASED
+        axes[teleop_funcs.POWER_AXIS] = -1.0 if power else RELEASED
+        axes[teleop_funcs.SIT_STAND_AXIS] = 1.0 if sit_stand else 0.0
+        axes[teleop_funcs.MODE_AXIS] = mode
+        joy_msg = Joy(axes=axes)
+        joy_msg.header.stamp = rospy.Time.now() - rospy.Duration(age)
+
+        submitted = self.teleop._inflight
+        self.teleop.handle_joy(joy_msg)
+        self.teleop._process_latest(None)
+        if self.teleop._inflight is not submitted:
+            futures.wait([self.teleop._inflight], timeout=5.0)
+
+
+class TestEdgeTrigger(TeleopFuncsTestCase):
+    def test_held_button_fires_once(self):
+        self.send(mode=1.0)
+        self.send(mode=1.0)
+        self.send(mode=1.0)
+        self.assertEqual(self.spot_wrapper.calls, ["set_mobility_params"])
+        self.assertEqual(
+            self.spot_wrapper.mobility_params.locomotion_hint, teleop_funcs.HINT_TROT
+        )
+
+    def test_release_and_press_fires_again(self):
+        self.send(mode=1.0)
+        self.send(mode=0.0)
+        self.send(mode=1.0)
+        self.assertEqual(
+            self.spot_wrapper.mobility_params.locomotion_hint,
+            teleop_funcs.HINT_SPEED_SELECT_TROT,
+        )
+
+    def test_deadman_released_before_dpad(self):
+        self.send(mode=1.0)
+        self.send(enable=False, mode=1.0)
+        self.send(enable=False, mode=0.0)
+        self.send(enable=False, mode=1.0)
+        self.send(mode=1.0)
+        self.assertEqual(
+            self.spot_wrapper.calls, ["set_mobility_params", "set_mobility_params"]
+        )
+
+    def test_power_pressed_before_deadman(self):
+        self.send(enable=False, power=True)
+        self.assertEqual(self.spot_wrapper.calls, [])
+        self.send(power=True)
+        self.assertEqual(self.spot_wrapper.calls, ["power_on"])
+
+    def test_power_pressed_with_deadman(self):
+        self.send(power=True)
+        self.send(power=True)
+        self.assertEqual(self.spot_wrapper.calls, ["power_on"])
+
+    def test_no_request_without_deadman(self):
+        self.send(enable=False, power=True, sit_stand=True, mode=-1.0)
+        self.assertEqual(self.spot_wrapper.calls, [])
+
+
+class TestModeCycle(TeleopFuncsTestCase):
+    def test_locomotion_hint_values(self):
+        expected = [
+            teleop_funcs.HINT_TROT,
+            teleop_funcs.HINT_SPEED_SELECT_TROT,
+            teleop_funcs.HINT_CRAWL,
+            teleop_funcs.HINT_SPEED_SELECT_CRAWL,
+            teleop_funcs.HINT_AMBLE,
+            teleop_funcs.HINT_SPEED_SELECT_AMBLE,
+            teleop_funcs.HINT_AUTO,
+        ]
+        for locomotion_hint in expected:
+            self.send(mode=1.0)
+            self.send()
+            self.assertEqual(
+                self.spot_wrapper.mobility_params.locomotion_hint, locomotion_hint
+            )
+
+    def test_stairs_mode_values(self):
+        expected = [
+            teleop_funcs.STAIRS_MODE_ON,
+            teleop_funcs.STAIRS_MODE_AUTO,
+            teleop_funcs.STAIRS_MODE_OFF,
+        ]
+        for stairs_mode in expected:
+            self.send(mode=-1.0)
+            self.send()
+            self.assertEqual(self.spot_wrapper.mobility_params.stairs_mode, stairs_mode)
+            self.assertFalse(self.spot_wrapper.mobility_params.stair_hint)
+
+
+class TestStaleDrop(TeleopFuncsTestCase):
+    def test_stale_message_dropped(self):
+        with mock.patch.object(teleop_funcs.rospy, "logwarn_throttle") as logwarn:
+            self.send(power=True, age=1.0)
+        self.assertEqual(self.spot_wrapper.calls, [])
+        logwarn.assert_called_once()
+
+    def test_press_in_stale_message_fires_on_next(self):
+        self.send(power=True, age=1.0)
+        self.send(power=True)
+        self.assertEqual(self.spot_wrapper.calls, ["power_on"])
+
+    def test_fresh_message_handled(self):
+        self.send(power=True, age=0.0)
+        self.assertEqual(self.spot_wrapper.calls, ["power_on"])
+
+    def test_message_processed_once(self):
+        self.send(mode=-1.0)
+        self.teleop._process_latest(None)
+        self.assertEqual(self.spot_wrapper.calls, ["set_mobility_params"])
+
+
+class TestPauseGate(TeleopFuncsTestCase):
+    def test_requests_ignored_during_pause(self):
+        self.teleop._pause_until_ns = time.monotonic_ns() + int(60 * 1e9)
+        self.send(power=True)
+        self.assertEqual(self.spot_wrapper.calls, [])
+
+    def test_requests_ignored_while_inflight(self):
+        self.teleop._inflight = mock.Mock(done=mock.Mock(return_value=False))
+        self.send(sit_stand=True)
+        self.assertEqual(self.spot_wrapper.calls, [])
+
+    def test_sit_stand_starts_pause(self):
+        self.teleop = self.make_teleop(sit_stand_pause_secs=60)
+        self.send(sit_stand=True)
+        self.send()
+        self.send(sit_stand=True)
+        self.assertEqual(self.spot_wrapper.calls, ["stand"])
+
+    def test_mode_toggles_do_not_pause(self):
+        self.teleop = self.make_teleop(power_on_pause_secs=60, sit_stand_pause_secs=60)
+        self.send(mode=1.0)
+        self.send()
+        self.send(mode=-1.0)
+        self.assertEqual(
+            self.spot_wrapper.calls, ["set_mobility_params", "set_mobility_params"]
+        )
+
+
+class TestExecutor(TeleopFuncsTestCase):
+    def test_request_runs_on_worker(self):
+        self.send(sit_stand=True)
+        self.assertEqual(self.spot_wrapper.calls, ["stand"])
+        self.send()
+        self.send(sit_stand=True)
+        self.assertEqual(self.spot_wrapper.calls, ["stand", "sit"])
+
+    def test_motion_not_allowed(self):
+        self.motion_allowed = False
+        self.send(sit_stand=True)
+        self.assertEqual(self.spot_wrapper.calls, [])
+
+    def test_worker_exception_is_logged(self):
+        self.spot_wrapper.check_is_powered_on = mock.Mock(
+            side_effect=RuntimeError("robot unreachable")
+        )
+        self.teleop = self.make_teleop()
+        with mock.patch.object(teleop_funcs.rospy, "logerr") as logerr:
+            self.send(power=True)
+            self.wait_for_call(logerr)
+        self.assertIsInstance(self.teleop._inflight.exception(), RuntimeError)
+        logerr.assert_called_once()
+        self.assertIn("robot unreachable", logerr.call_args[0][0])
+
+    def wait_for_call(self, log_mock):
+        # The done callback runs just after the future completes.
+        deadline = time.monotonic() + 5.0
+        while not log_mock.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_mode_rpc_error_is_logged(self):
+        self.spot_wrapper.set_mobility_params = mock.Mock(
+            side_effect=RpcError(None, "robot unreachable")
+        )
+        with mock.patch.object(teleop_funcs.rospy, "logerr") as logerr:
+            with mock.patch.object(
+                teleop_funcs.rospy, "logerr_throttle"
+            ) as logerr_throttle:
+                self.send(mode=1.0)
+        self.assertIsNone(self.teleop._inflight.exception())
+        logerr_throttle.assert_called_once()
+        self.assertIn("robot unreachable", logerr_throttle.call_args[0][1])
+        logerr.assert_not_called()
+
+    def test_mode_unexpected_error_reaches_done_callback(self):
+        self.spot_wrapper.set_mobility_params = mock.Mock(
+            side_effect=KeyError("locomotion_hint")
+        )
+        with mock.patch.object(teleop_funcs.rospy, "logerr") as logerr:
+            self.send(mode=1.0)
+            self.wait_for_call(logerr)
+        self.assertIsInstance(self.teleop._inflight.exception(), KeyError)
+        logerr.assert_called_once()
+        self.assertIn("locomotion_hint", logerr.call_args[0][0])
+
+
+class TestSuiteTeleopFuncs(unittest.TestSuite):
+    def __init__(self):
+        super(TestSuiteTeleopFuncs, self).__init__()
+        self.loader = unittest.TestLoader()
+        self.addTest(self.loader.loadTestsFromTestCase(TestEdgeTrigger))
+        self.addTest(self.loader.loadTestsFromTestCase(TestModeCycle))
+        self.addTest(self.loader.loadTestsFromTestCase(TestStaleDrop))
+        self.addTest(self.loader.loadTestsFromTestCase(TestPauseGate))
+        self.addTest(self.loader.loadTestsFromTestCase(TestExecutor))
+
+
+if __name__ == "__main__":
+    print("Starting tests!")
+    import rosunit
+
+    rosunit.unitrun(PKG, NAME, TestEdgeTrigger)
+    rosunit.unitrun(PKG, NAME, TestModeCycle)
+    rosunit.unitrun(PKG, NAME, TestStaleDrop)
+    rosunit.unitrun(PKG, NAME, TestPauseGate)
+    rosunit.unitrun(PKG, NAME, TestExecutor)
+
+    print("Tests complete!")